@@ -1,6 +1,9 @@
 import random
 from simulator.message import Message
 
+# Per-frame trace output: frame markers, per-frame statistics and source bookkeeping
+DEBUG = False
+
 class ComparisonPhaseManager:
     """
     Manages the comparison phase of the simulation
@@ -11,6 +14,10 @@ class ComparisonPhaseManager:
     def __init__(self, network):
         self.network = network
         self.messages = {}
+        self._messages_by_start_frame = {}  # start_frame -> [messages], in message ID order
+        self.messages_by_source = {}  # source node ID -> [messages], in message ID order
+        self.messages_by_target = {}  # target node ID -> [messages], in message ID order
+        self._completed_count = 0  # Completed messages already counted in the statistics
         self.current_frame = 0
         self.total_frames = 60
         
@@ -51,6 +58,10 @@ class ComparisonPhaseManager:
     def generate_comparison_messages(self, num_messages):
         """Generate RANDOM comparison messages for algorithm testing"""
         self.messages.clear()
+        self._messages_by_start_frame = {}
+        self.messages_by_source = {}
+        self.messages_by_target = {}
+        self._completed_count = 0
         node_ids = list(self.network.nodes.keys())
         network_size = len(node_ids)  # Get network size for dynamic hop limits
         
@@ -76,15 +87,21 @@ class ComparisonPhaseManager:
         print(f"Total frames: {self.total_frames} (ensures {self.total_frames - hop_limit} frames minimum completion time)")
         
         for msg_id in range(num_messages):
-            # Choose random source and target (different nodes)
-            source = random.choice(node_ids)
-            target = random.choice([n for n in node_ids if n != source])
+            # Choose random source and target (different nodes) - picking an index among
+            # the other N-1 nodes draws exactly what choice() on the filtered list would
+            source_index = random.randrange(network_size)
+            source = node_ids[source_index]
+            target_index = random.randrange(network_size - 1)
+            target = node_ids[target_index if target_index < source_index else target_index + 1]
             
             # Create message with network size for dynamic hop limits
             message = Message(msg_id, source, target, self.total_frames, network_size)
             # Message class will automatically calculate appropriate start_frame
             
             self.messages[msg_id] = message
+            self._messages_by_start_frame.setdefault(message.start_frame, []).append(message)
+            self.messages_by_source.setdefault(source, []).append(message)
+            self.messages_by_target.setdefault(target, []).append(message)
             print(f"  Test Msg {msg_id}: {source} -> {target} (Frame {message.start_frame}, Hops: {message.hop_limit})")
         
         print("Messages are random - each run tests different scenarios")
@@ -156,11 +173,13 @@ class ComparisonPhaseManager:
             if msg_id in self.stats['message_details']:
                 self.stats['message_details'][msg_id]['total_receptions_for_this_message'] += count
         
-        print(f"Frame {self.current_frame} stats: {total_attempts} transmissions, {successful_receptions} successful, {collision_count} collisions")
+        if DEBUG:
+            print(f"Frame {self.current_frame} stats: {total_attempts} transmissions, {successful_receptions} successful, {collision_count} collisions")
             
     def execute_comparison_frame(self, message_processor):
         """Execute one comparison frame"""
-        print(f"\n--- COMPARISON FRAME {self.current_frame + 1} START ---")
+        if DEBUG:
+            print(f"\n--- COMPARISON FRAME {self.current_frame + 1} START ---")
         
         # Reset all nodes FIRST (clear old status)
         for node in self.network.nodes.values():
@@ -177,24 +196,27 @@ class ComparisonPhaseManager:
         
         # Process message transmissions using the message processor
         transmission_queue, sending_nodes, successful_receives, completed_messages = \
-            message_processor.process_transmissions(self.messages, "comparison", self)
+            message_processor.process_transmissions(self.messages, "comparison", self, self.current_frame + 1,
+                                                   (self.messages_by_source, self.messages_by_target))
         
-        # Count collisions for statistics
+        # Count collisions for statistics - once per frame, shared with the frame statistics
         collision_count = sum(1 for node in self.network.nodes.values() 
-                            if node.status_flags[node.STATUS_COLLISION])
+                            if node.has_status(node.STATUS_COLLISION))
         
         # Clean up completed comparison messages
+        live_endpoints = self._live_endpoints()
         for message in completed_messages:
-            self._clear_message_status(message)
+            self._clear_message_status(message, live_endpoints)
             # Update message completion stats
             self._update_message_completion_stats(message)
         
         # Update frame statistics
-        self._update_frame_statistics()
+        self._update_frame_statistics(collision_count)
         
         self.current_frame += 1
         
-        print(f"--- COMPARISON FRAME {self.current_frame} END ---")
+        if DEBUG:
+            print(f"--- COMPARISON FRAME {self.current_frame} END ---")
         
         return transmission_queue
     
@@ -222,8 +244,8 @@ class ComparisonPhaseManager:
         """Start messages that should begin this frame"""
         started_messages = []
         
-        for message in self.messages.values():
-            if message.start_frame == (self.current_frame + 1) and not message.is_active:
+        for message in self._messages_by_start_frame.get(self.current_frame + 1, []):
+            if not message.is_active:
                 message.start_transmission()
                 
                 # Mark source and target nodes
@@ -232,14 +254,13 @@ class ComparisonPhaseManager:
                 
                 # Mark that source node has "seen" this message
                 source_node = self.network.nodes[message.source]
-                if not hasattr(source_node, 'received_message_ids'):
-                    source_node.received_message_ids = set()
                 source_node.received_message_ids.add(message.id)
-                print(f"Source node {message.source} marked Message {message.id} as seen")
+                if DEBUG:
+                    print(f"Source node {message.source} marked Message {message.id} as seen")
                 
-                # Add message to source node's pending list
+                # Add message to source node's pending list - no hops used yet
                 initial_path = [message.source]
-                self.network.nodes[message.source].pending_messages.append((message, initial_path))
+                self.network.nodes[message.source].pending_messages.append((message, initial_path, message.hop_limit))
                 
                 started_messages.append(f"Message {message.id}: {message.source} -> {message.target}")
         
@@ -248,33 +269,26 @@ class ComparisonPhaseManager:
             for msg in started_messages:
                 print(f"  {msg}")
                 
-    def _update_frame_statistics(self):
-        """Update statistics for current frame"""
+    def _update_frame_statistics(self, collision_count):
+        """Update statistics for current frame, given the number of nodes that had a collision"""
         # Count active messages
+        # (per-frame arrays are sized to total_frames when messages are generated or reset,
+        # and current_frame stays below total_frames here, so the index is always in range)
         active_count = sum(1 for m in self.messages.values() if m.is_active)
-        if self.current_frame <= len(self.stats['active_messages_per_frame']):
-            # Extend array if needed
-            while len(self.stats['active_messages_per_frame']) < self.current_frame:
-                self.stats['active_messages_per_frame'].append(0)
-            if self.current_frame > 0:
-                self.stats['active_messages_per_frame'][self.current_frame - 1] = active_count
-        
-        # Count collisions this frame
-        collision_count = sum(1 for node in self.network.nodes.values() 
-                            if node.status_flags[node.STATUS_COLLISION])
-        if self.current_frame <= len(self.stats['collisions_per_frame']):
-            # Extend array if needed
-            while len(self.stats['collisions_per_frame']) < self.current_frame:
-                self.stats['collisions_per_frame'].append(0)
-            if self.current_frame > 0:
-                self.stats['collisions_per_frame'][self.current_frame - 1] = collision_count
-                self.stats['total_collisions'] += collision_count
+        if self.current_frame > 0:
+            self.stats['active_messages_per_frame'][self.current_frame - 1] = active_count
+        
+        # Collisions this frame
+        if self.current_frame > 0:
+            self.stats['collisions_per_frame'][self.current_frame - 1] = collision_count
+            self.stats['total_collisions'] += collision_count
         
         # Count completed messages (but don't double count)
         newly_completed = []
         for message in self.messages.values():
             if message.is_completed and not hasattr(message, '_stats_counted'):
                 message._stats_counted = True
+                self._completed_count += 1
                 newly_completed.append(message)
                 
                 # Use the message's own status
@@ -290,51 +304,55 @@ class ComparisonPhaseManager:
                 status = "SUCCESS" if msg.get_status() == "SUCCESS" else "FAILED"
                 print(f"  Message {msg.id}: {status}")
         
-        if collision_count > 0:
+        if DEBUG and collision_count > 0:
             print(f"Collisions detected: {collision_count}")
     
-    def _clear_message_status(self, completed_message):
-        """Clear source/target status when message completes"""
+    def _live_endpoints(self, excluded_message=None):
+        """Source and target node IDs of all active, not completed messages, as two sets"""
+        live_sources = set()
+        live_targets = set()
+        for msg in self.messages.values():
+            if msg.is_active and not msg.is_completed and msg != excluded_message:
+                live_sources.add(msg.source)
+                live_targets.add(msg.target)
+        return live_sources, live_targets
+    
+    def _clear_message_status(self, completed_message, live_endpoints=None):
+        """Clear source/target status when message completes
+        
+        live_endpoints is a _live_endpoints() snapshot shared by all messages completing
+        in the same frame; without it one is taken here
+        """
         source_id = completed_message.source
         target_id = completed_message.target
         message_id = completed_message.id
         
-        # Remove this message from ALL nodes' pending_messages
+        # Remove this message from ALL nodes' pending_messages - only lists holding a copy are rebuilt
         for node in self.network.nodes.values():
-            new_pending = []
-            for pending_item in node.pending_messages:
-                if len(pending_item) == 2:
-                    msg, path = pending_item
-                    if msg.id != message_id:
-                        new_pending.append(pending_item)
-                elif len(pending_item) == 3:
-                    msg, path, hop_limit = pending_item
-                    if msg.id != message_id:
-                        new_pending.append(pending_item)
-            node.pending_messages = new_pending
+            pending = node.pending_messages
+            if pending and any(msg.id == message_id for msg, path, hop_limit in pending):
+                node.pending_messages = [pending_item for pending_item in pending
+                                         if pending_item[0].id != message_id]
+        
+        if live_endpoints is None:
+            live_endpoints = self._live_endpoints(completed_message)
+        live_sources, live_targets = live_endpoints
         
         # Check if source has OTHER active messages
-        source_has_other_active = any(
-            msg.is_active and not msg.is_completed and msg.source == source_id 
-            for msg in self.messages.values() 
-            if msg != completed_message
-        )
-        if not source_has_other_active:
+        if source_id not in live_sources:
             self.network.nodes[source_id].set_as_source(False)
             
         # Check if target has OTHER active messages
-        target_has_other_active = any(
-            msg.is_active and not msg.is_completed and msg.target == target_id 
-            for msg in self.messages.values() 
-            if msg != completed_message
-        )
-        if not target_has_other_active:
+        if target_id not in live_targets:
             self.network.nodes[target_id].set_as_target(False)
     
     def is_complete(self):
         """Check if comparison phase is complete"""
-        return (self.current_frame >= self.total_frames or 
-                all(msg.is_completed for msg in self.messages.values()))
+        return self.current_frame >= self.total_frames or self.all_messages_completed()
+    
+    def all_messages_completed(self):
+        """Check if every message has completed - kept as a running count by _update_frame_statistics"""
+        return self._completed_count == len(self.messages)
     
     def calculate_final_metrics(self):
         """Calculate final efficiency metrics"""
@@ -357,6 +375,7 @@ class ComparisonPhaseManager:
     def reset_simulation(self):
         """Reset simulation to initial state"""
         self.current_frame = 0
+        self._completed_count = 0
         
         # Reset all messages
         for message in self.messages.values():
@@ -365,6 +384,7 @@ class ComparisonPhaseManager:
             message.completion_reason = None
             message.current_hops = message.hop_limit
             message.paths.clear()
+            message._path_keys.clear()
             message.active_copies.clear()
             # Clear statistics flag
             if hasattr(message, '_stats_counted'):
@@ -377,10 +397,9 @@ class ComparisonPhaseManager:
             node.set_as_target(False)
             node.pending_messages.clear()
             node.received_messages.clear()
-            if hasattr(node, 'seen_message_copies'):
-                node.seen_message_copies.clear()
-            if hasattr(node, 'received_message_ids'):
-                node.received_message_ids.clear()
+            node.seen_message_copies.clear()
+            node.received_message_ids.clear()
+            node.message_frames.clear()
             # DON'T reset knowledge trees - they're from learning phase!
                 
         # Reset enhanced statistics
@@ -530,8 +549,13 @@ class ComparisonPhaseManager:
             print(f"  Successful receptions: {details.get('total_receptions_for_this_message', 0)}")
             
             if message.paths:
-                shortest_path = min(message.paths, key=len)
-                longest_path = max(message.paths, key=len)
+                # Shortest and longest path in one pass (first one wins on ties, like min/max)
+                shortest_path = longest_path = message.paths[0]
+                for path in message.paths:
+                    if len(path) < len(shortest_path):
+                        shortest_path = path
+                    elif len(path) > len(longest_path):
+                        longest_path = path
                 print(f"  Shortest path: {shortest_path} (length: {len(shortest_path)})")
                 print(f"  Longest path: {longest_path} (length: {len(longest_path)})")
                 if message.get_status() == "SUCCESS":
@@ -1,5 +1,7 @@
 import matplotlib.pyplot as plt
-import math
+from matplotlib.collections import LineCollection, PatchCollection
+import numpy as np
+from simulator.node import Color
 
 class DisplayManager:
     """
@@ -7,6 +9,18 @@ class DisplayManager:
     Handles network visualization, info panels, and user input
     """
     
+    # Matplotlib color name for each node Color
+    NODE_COLORS = {
+        Color.LIGHTBLUE: 'lightblue',
+        Color.GREEN: 'green',
+        Color.RED: 'red',
+        Color.PINK: 'pink',
+        Color.ORANGE: 'orange',
+    }
+    
+    # Colors for different messages (cycle through if more messages than colors)
+    MESSAGE_COLORS = ('purple', 'brown', 'blue', 'cyan', 'green', 'magenta', 'red')
+    
     def __init__(self, network):
         self.network = network
         self.fig = None
@@ -20,6 +34,21 @@ class DisplayManager:
         self.total_frames = 0
         self.current_transmissions = []
         
+        # Static network geometry, cached once the topology is built
+        self._edge_segments = np.empty((0, 2, 2))  # (E, 2, 2) edge endpoint coordinates
+        self._node_circles = []  # One Circle per node, in node ID order
+        self._xlim = None
+        self._ylim = None
+        
+        # Artists kept on the network axes between frames
+        self._node_collection = None  # Built by _draw_static_network, recolored every frame
+        self._dynamic_artists = []  # Borders and transmissions drawn for the current frame only
+        
+        # Info-panel message orderings, re-sorted only when the message set changes
+        self._order_snapshot = None
+        self._messages_by_start = []  # [(msg_id, message)] sorted by (start_frame, msg_id)
+        self._messages_by_id = []  # [(msg_id, message)] sorted by msg_id
+        
         # Callback for key events (set by main simulator)
         self.key_callback = None
         
@@ -67,6 +96,26 @@ class DisplayManager:
         self.total_frames = total_frames
         self._show_controls()
         
+    def cache_network_geometry(self):
+        """Precompute edge segments, node circles and axis limits - call after the topology is built"""
+        positions = self.network.positions
+        edges = np.array(list(self.network.graph.edges()), dtype=int).reshape(-1, 2)
+        self._edge_segments = positions[edges]
+        self._node_circles = [plt.Circle(pos, 0.15) for pos in positions]
+        
+        if len(positions):
+            margin = 0.5
+            mins = positions.min(axis=0)
+            maxs = positions.max(axis=0)
+            self._xlim = (mins[0] - margin, maxs[0] + margin)
+            self._ylim = (mins[1] - margin, maxs[1] + margin)
+        else:
+            self._xlim = None
+            self._ylim = None
+        
+        # Topology changed - rebuild the static artists on the next draw
+        self._node_collection = None
+        
     def set_transmissions(self, transmissions):
         """Set current transmissions for display"""
         self.current_transmissions = transmissions
@@ -85,10 +134,20 @@ class DisplayManager:
             self.key_callback(event)
             
     def draw_network(self):
-        """Draw the current state of the network"""
-        # Clear axes completely
-        self.ax.clear()
-        self.ax.cla()
+        """Draw the current state of the network
+        
+        Edges, node circles and labels are built once and kept on the axes;
+        each frame only recolors the nodes and replaces the per-frame artists
+        """
+        if self._node_collection is None or self._node_collection.axes is not self.ax:
+            self._draw_static_network()
+        else:
+            # Remove last frame's borders, transmissions and legend
+            for artist in self._dynamic_artists:
+                artist.remove()
+            if self.ax.get_legend() is not None:
+                self.ax.get_legend().remove()
+        self._dynamic_artists = []
         
         # Set title based on mode
         if self.current_mode == "learning":
@@ -97,120 +156,123 @@ class DisplayManager:
             title = f"Network Flooding Simulation - Frame {self.current_frame}/{self.total_frames}"
             
         self.ax.set_title(title)
-        self.ax.set_aspect('equal')
-        self.ax.grid(True, alpha=0.3)
         
-        # Draw edges (connections) - GRAY BACKGROUND FIRST
-        for edge in self.network.graph.edges():
-            node1, node2 = edge
-            pos1 = self.network.node_positions[node1]
-            pos2 = self.network.node_positions[node2]
-            
-            self.ax.plot([pos1[0], pos2[0]], [pos1[1], pos2[1]], 
-                        'gray', linewidth=1, alpha=0.6, zorder=1)
+        # Recolor nodes with current colors
+        node_colors = [self.NODE_COLORS[node.get_display_color()] for node in self.network.nodes.values()]
+        self._node_collection.set_facecolors(node_colors)
+        self._node_collection.set_edgecolors(node_colors)
         
-        # Draw nodes with current colors
         for node_id, node in self.network.nodes.items():
-            pos = self.network.node_positions[node_id]
-            color = node.get_display_color()
-            
-            # Draw node circle
-            circle = plt.Circle(pos, 0.15, color=color, zorder=3)
-            self.ax.add_patch(circle)
-            
             # Add borders for special states
-            if (node.status_flags[node.STATUS_SENDING] and 
-                (node.status_flags[node.STATUS_SOURCE] or node.status_flags[node.STATUS_TARGET] or node.status_flags[node.STATUS_COLLISION] ) ):
-                border_circle = plt.Circle(pos, 0.15, fill=False, 
+            if (node.has_status(node.STATUS_SENDING) and 
+                node.has_status(node.STATUS_SOURCE | node.STATUS_TARGET | node.STATUS_COLLISION)):
+                border_circle = plt.Circle(self.network.node_positions[node_id], 0.15, fill=False, 
                                         edgecolor='orange', linewidth=3, zorder=4)
-                self.ax.add_patch(border_circle)
+                self._dynamic_artists.append(self.ax.add_patch(border_circle))
 
-            if (node.status_flags[node.STATUS_COLLISION] and 
-                (node.status_flags[node.STATUS_SOURCE] or node.status_flags[node.STATUS_TARGET])):
-                border_circle = plt.Circle(pos, 0.15, fill=False, 
+            if (node.has_status(node.STATUS_COLLISION) and 
+                node.has_status(node.STATUS_SOURCE | node.STATUS_TARGET)):
+                border_circle = plt.Circle(self.network.node_positions[node_id], 0.15, fill=False, 
                                         edgecolor='pink', linewidth=3, zorder=4)
-                self.ax.add_patch(border_circle)
-            
-            # Add node label
-            self.ax.text(pos[0], pos[1], str(node_id), 
-                        ha='center', va='center', fontsize=10, 
-                        fontweight='bold', zorder=5)
+                self._dynamic_artists.append(self.ax.add_patch(border_circle))
         
         # Draw active message transmissions - LAST, ON TOP
         self._draw_active_transmissions()
+    
+    def _draw_static_network(self):
+        """Clear the axes and draw the parts of the network that never change between frames"""
+        # Clear axes completely
+        self.ax.clear()
+        
+        self.ax.set_aspect('equal')
+        self.ax.grid(True, alpha=0.3)
+        
+        # Draw edges (connections) - GRAY BACKGROUND FIRST, one artist for all edges
+        self.ax.add_collection(LineCollection(self._edge_segments, colors='gray',
+                                              linewidths=1, alpha=0.6, zorder=1))
+        
+        # Draw nodes, one artist for all circles - colors are set every frame
+        self._node_collection = PatchCollection(self._node_circles, zorder=3)
+        self.ax.add_collection(self._node_collection)
+        
+        # Add node labels
+        for node_id in self.network.nodes:
+            pos = self.network.node_positions[node_id]
+            self.ax.text(pos[0], pos[1], str(node_id), 
+                        ha='center', va='center', fontsize=10, 
+                        fontweight='bold', zorder=5)
         
         # Set axis limits
-        positions = list(self.network.node_positions.values())
-        if positions:
-            x_coords = [pos[0] for pos in positions]
-            y_coords = [pos[1] for pos in positions]
-            
-            margin = 0.5
-            self.ax.set_xlim(min(x_coords) - margin, max(x_coords) + margin)
-            self.ax.set_ylim(min(y_coords) - margin, max(y_coords) + margin)
+        if self._xlim is not None:
+            self.ax.set_xlim(*self._xlim)
+            self.ax.set_ylim(*self._ylim)
 
     def _draw_active_transmissions(self):
-        """Draw lines for actual transmissions happening this frame"""
+        """Draw lines for actual transmissions happening this frame - one line collection and one quiver for all"""
         transmission_count = 0
-        
-        # Define colors for different messages (cycle through if more messages than colors)
-        message_colors = ['purple', 'brown', 'blue', 'cyan', 'green', 'magenta', 'red']
+        active_messages = set()  # Unique message IDs being transmitted, for the legend
         
         # Draw lines based on ACTUAL transmissions in the queue
         if self.current_transmissions:
+            # One pass over the queue collects the endpoints, message IDs and legend entries
+            positions = self.network.positions
+            endpoints = []
+            msg_id_list = []
             for sender_id, receiver_id, message, sender_path, hop_limit in self.current_transmissions:
-                sender_pos = self.network.node_positions[sender_id]
-                receiver_pos = self.network.node_positions[receiver_id]
+                endpoints.append((sender_id, receiver_id))
+                msg_id_list.append(message.id)
+            active_messages.update(msg_id_list)
+            
+            endpoints = np.array(endpoints, dtype=int)
+            senders = endpoints[:, 0]
+            receivers = endpoints[:, 1]
+            message_ids = np.array(msg_id_list, dtype=int)
+            
+            starts = positions[senders]
+            deltas = positions[receivers] - starts
+            lengths = np.hypot(deltas[:, 0], deltas[:, 1])
+            
+            drawn = lengths > 0
+            transmission_count = int(drawn.sum())
+            
+            if transmission_count > 0:
+                starts = starts[drawn]
+                deltas = deltas[drawn]
+                lengths = lengths[drawn]
+                message_ids = message_ids[drawn]
+                
+                # Get color for each message (cycle through colors)
+                message_colors = self.MESSAGE_COLORS
+                colors = [message_colors[i] for i in (message_ids % len(message_colors)).tolist()]
                 
-                # Get color for this message (cycle through colors)
-                color = message_colors[message.id % len(message_colors)]
+                # Small perpendicular offset for multiple messages on same link: -0.02, 0, 0.02
+                offsets = (message_ids % 3 - 1) * 0.02
+                units = deltas / lengths[:, None]
+                perp = np.stack([-units[:, 1], units[:, 0]], axis=1) * offsets[:, None]
                 
-                # Calculate line positions (with small offset for multiple messages)
-                dx = receiver_pos[0] - sender_pos[0]
-                dy = receiver_pos[1] - sender_pos[1]
-                length = math.sqrt(dx*dx + dy*dy)
+                line_starts = starts + perp
+                line_ends = line_starts + deltas
                 
-                if length > 0:
-                    # Small offset for multiple messages on same link
-                    offset = (message.id % 3 - 1) * 0.02  # -0.02, 0, 0.02
-                    
-                    # Perpendicular offset
-                    perp_x = -dy / length * offset
-                    perp_y = dx / length * offset
-                    
-                    start_x = sender_pos[0] + perp_x
-                    start_y = sender_pos[1] + perp_y
-                    end_x = receiver_pos[0] + perp_x
-                    end_y = receiver_pos[1] + perp_y
-                    
-                    # Draw transmission line with message-specific color and THICK line
-                    self.ax.plot([start_x, end_x], [start_y, end_y], 
-                            color=color, linewidth=2.5, alpha=0.9, zorder=2)
-                    
-                    # Add arrow to show direction
-                    dx_norm = dx / length * 0.25  # Arrow size
-                    dy_norm = dy / length * 0.25
-                    
-                    arrow_x = end_x - dx_norm
-                    arrow_y = end_y - dy_norm
-                    
-                    self.ax.annotate('', xy=(end_x, end_y), xytext=(arrow_x, arrow_y),
-                                arrowprops=dict(arrowstyle='->', color=color, 
-                                                lw=3, alpha=0.9, shrinkA=0, shrinkB=0), zorder=2)
-                    
-                    transmission_count += 1
+                # Draw transmission lines with message-specific color and THICK line
+                lines = LineCollection(np.stack([line_starts, line_ends], axis=1), colors=colors,
+                                       linewidths=2.5, alpha=0.9, zorder=2)
+                self._dynamic_artists.append(self.ax.add_collection(lines))
+                
+                # Add arrow heads at the receiver end to show direction
+                arrows = units * 0.25  # Arrow size
+                arrow_starts = line_ends - arrows
+                self._dynamic_artists.append(self.ax.quiver(arrow_starts[:, 0], arrow_starts[:, 1],
+                                                            arrows[:, 0], arrows[:, 1], color=colors,
+                                                            angles='xy', scale_units='xy', scale=1,
+                                                            width=0.006, headwidth=4, headlength=5,
+                                                            headaxislength=4.5, alpha=0.9, zorder=2))
         
         # Add legend if there are transmissions
         if transmission_count > 0:
-            # Get unique messages being transmitted
-            active_messages = set()
-            for sender_id, receiver_id, message, sender_path, hop_limit in self.current_transmissions:
-                active_messages.add(message.id)
-            
             # Create legend entries with message IDs
             legend_elements = []
             for msg_id in sorted(active_messages):
-                color = message_colors[msg_id % len(message_colors)]
+                color = self.MESSAGE_COLORS[msg_id % len(self.MESSAGE_COLORS)]
                 line = plt.Line2D([0], [0], color=color, linewidth=2.5, 
                                 label=f'Msg {msg_id}')
                 legend_elements.append(line)
@@ -245,15 +307,17 @@ class DisplayManager:
             y = add_text("-" * len(title), y-0.015, fontsize=10)
             return y - 0.01
         
+        messages_by_start, messages_by_id = self._get_message_orders(messages)
+        min_hops = self._get_current_hop_limits()
+        
         # Show messages based on current mode
         if mode == "learning":
             # Learning mode - show learning messages
             y_pos = add_header("LEARNING MESSAGES", y_pos)
             
-            # Filter out completed learning messages from active list
-            all_messages = [(msg_id, msg) for msg_id, msg in messages.items() 
-                          if not msg.is_completed and (msg.is_active or msg.start_frame > self.current_frame)]
-            sorted_messages = sorted(all_messages, key=lambda x: (x[1].start_frame, x[0]))
+            # Filter out completed learning messages from active list (already in display order)
+            sorted_messages = [(msg_id, msg) for msg_id, msg in messages_by_start
+                               if not msg.is_completed and (msg.is_active or msg.start_frame > self.current_frame)]
             recent_messages = sorted_messages[:7] if len(sorted_messages) > 7 else sorted_messages
             
             for msg_id, message in recent_messages:
@@ -261,24 +325,23 @@ class DisplayManager:
                             y_pos)
                 
                 if message.is_active:
-                    current_min_hops = self._get_current_hop_limit(message)
+                    current_min_hops = min_hops.get(msg_id, 0)
                     y_pos = add_text(f"  Hop Limit: {current_min_hops}/{message.hop_limit}", y_pos, fontsize=9)
                 
                 y_pos -= 0.01
             
             if len(sorted_messages) > 7:
                 y_pos = add_text(f"... and {len(sorted_messages) - 7} more learning messages", y_pos, fontsize=9, color='gray')
-            elif len(all_messages) == 0:
+            elif len(sorted_messages) == 0:
                 y_pos = add_text("All learning messages completed", y_pos, fontsize=9, color='green')
         
         else:
             # Normal simulation mode - show comparison messages
             y_pos = add_header("COMPARISON MESSAGES", y_pos)
             
-            # Filter out completed comparison messages from active list
-            all_messages = [(msg_id, msg) for msg_id, msg in messages.items() 
-                          if not msg.is_completed and (msg.is_active or msg.start_frame > self.current_frame)]
-            sorted_messages = sorted(all_messages, key=lambda x: (x[1].start_frame, x[0]))
+            # Filter out completed comparison messages from active list (already in display order)
+            sorted_messages = [(msg_id, msg) for msg_id, msg in messages_by_start
+                               if not msg.is_completed and (msg.is_active or msg.start_frame > self.current_frame)]
             recent_messages = sorted_messages[:7] if len(sorted_messages) > 7 else sorted_messages
             
             for msg_id, message in recent_messages:
@@ -286,14 +349,14 @@ class DisplayManager:
                             y_pos)
                 
                 if message.is_active:
-                    current_min_hops = self._get_current_hop_limit(message)
+                    current_min_hops = min_hops.get(msg_id, 0)
                     y_pos = add_text(f"  Hop Limit: {current_min_hops}/{message.hop_limit}", y_pos, fontsize=9)
                 
                 y_pos -= 0.01
             
             if len(sorted_messages) > 7:
                 y_pos = add_text(f"... and {len(sorted_messages) - 7} more messages", y_pos, fontsize=9, color='gray')
-            elif len(all_messages) == 0:
+            elif len(sorted_messages) == 0:
                 y_pos = add_text("All comparison messages completed", y_pos, fontsize=9, color='green')
         
         y_pos -= 0.02
@@ -301,8 +364,7 @@ class DisplayManager:
         # COMPLETED MESSAGES
         y_pos = add_header("COMPLETED MESSAGES", y_pos)
         
-        completed_messages = [(msg_id, msg) for msg_id, msg in messages.items() if msg.is_completed]
-        sorted_completed = sorted(completed_messages, key=lambda x: x[0])
+        sorted_completed = [(msg_id, msg) for msg_id, msg in messages_by_id if msg.is_completed]
         recent_completed = sorted_completed[-7:] if len(sorted_completed) > 7 else sorted_completed
         
         if recent_completed:
@@ -323,24 +385,25 @@ class DisplayManager:
         else:
             y_pos = add_text("None", y_pos)
     
-    def _get_current_hop_limit(self, message):
-        """Get current minimum hop limit for a message"""
-        current_min_hops = "?"
-        min_hops_found = []
+    def _get_message_orders(self, messages):
+        """Messages sorted by (start_frame, id) and by id - only re-sorted when the set of messages changes"""
+        snapshot = tuple(messages.values())
+        if snapshot != self._order_snapshot:
+            self._order_snapshot = snapshot
+            self._messages_by_start = sorted(messages.items(), key=lambda x: (x[1].start_frame, x[0]))
+            self._messages_by_id = sorted(messages.items(), key=lambda x: x[0])
+        return self._messages_by_start, self._messages_by_id
+    
+    def _get_current_hop_limits(self):
+        """Get current minimum hop limit for every message with pending copies, in one pass over all nodes"""
+        min_hops = {}
         
         for node in self.network.nodes.values():
-            for pending_item in node.pending_messages:
-                if len(pending_item) >= 3:
-                    pending_msg, path, local_hop_limit = pending_item
-                    if pending_msg.id == message.id:
-                        min_hops_found.append(local_hop_limit)
-        
-        if min_hops_found:
-            current_min_hops = min(min_hops_found)
-        else:
-            current_min_hops = 0
+            for pending_msg, path, local_hop_limit in node.pending_messages:
+                if local_hop_limit < min_hops.get(pending_msg.id, local_hop_limit + 1):
+                    min_hops[pending_msg.id] = local_hop_limit
         
-        return current_min_hops
+        return min_hops
     
     def update_display(self, messages=None, mode="learning"):
         """Update the complete display"""
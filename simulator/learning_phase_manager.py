@@ -1,6 +1,9 @@
 import random
 from simulator.message import Message
 
+# Per-frame trace output: frame markers, active endpoints and every node's knowledge tree
+DEBUG = False
+
 class LearningPhaseManager:
     """
     Manages the learning phase of the simulation
@@ -10,6 +13,9 @@ class LearningPhaseManager:
     def __init__(self, network):
         self.network = network
         self.learning_messages = {}
+        self._messages_by_start_frame = {}  # start_frame -> [messages], in message ID order
+        self.messages_by_source = {}  # source node ID -> [messages], in message ID order
+        self.messages_by_target = {}  # target node ID -> [messages], in message ID order
         self.current_frame = 0
         self.learning_frames = 0
         self.learning_complete = False
@@ -17,6 +23,9 @@ class LearningPhaseManager:
     def generate_learning_messages(self, num_nodes):
         """Generate predetermined learning messages for network topology learning"""
         self.learning_messages.clear()
+        self._messages_by_start_frame = {}
+        self.messages_by_source = {}
+        self.messages_by_target = {}
         learning_pairs = self._get_learning_pairs(num_nodes)
         
         msg_id = 0
@@ -44,6 +53,9 @@ class LearningPhaseManager:
             message.hop_limit = hop_limit  # Use dynamic hop limit
             
             self.learning_messages[msg_id] = message
+            self._messages_by_start_frame.setdefault(message.start_frame, []).append(message)
+            self.messages_by_source.setdefault(source, []).append(message)
+            self.messages_by_target.setdefault(target, []).append(message)
             print(f"  Learning Msg {msg_id}: {source} -> {target} (Frame {current_frame}, Hops: {hop_limit})")
             
             msg_id += 1
@@ -77,7 +89,8 @@ class LearningPhaseManager:
     
     def execute_learning_frame(self, message_processor):
         """Execute one learning frame"""
-        print(f"\n--- LEARNING FRAME {self.current_frame + 1} START ---")
+        if DEBUG:
+            print(f"\n--- LEARNING FRAME {self.current_frame + 1} START ---")
         
         # Reset all nodes COMPLETELY
         for node in self.network.nodes.values():
@@ -97,19 +110,24 @@ class LearningPhaseManager:
                 self.network.nodes[message.source].set_as_source(True)
                 self.network.nodes[message.target].set_as_target(True)
         
-        print(f"Active sources: {sorted(active_sources)}")
-        print(f"Active targets: {sorted(active_targets)}")
+        if DEBUG:
+            print(f"Active sources: {sorted(active_sources)}")
+            print(f"Active targets: {sorted(active_targets)}")
         
         # Start new messages for this frame
         self._start_learning_messages_for_frame()
         
         # Process message transmissions using the message processor
         transmission_queue, sending_nodes, successful_receives, completed_messages = \
-            message_processor.process_transmissions(self.learning_messages, "learning")
+            message_processor.process_transmissions(self.learning_messages, "learning",
+                                                     current_frame=self.current_frame + 1,
+                                                     endpoint_index=(self.messages_by_source,
+                                                                     self.messages_by_target))
         
         # Clean up completed learning messages IMMEDIATELY
+        live_endpoints = self._live_endpoints()
         for message in completed_messages:
-            self._clear_learning_message_status(message)
+            self._clear_learning_message_status(message, live_endpoints)
             print(f"Cleared colors for completed Learning Message {message.id}")
         
         self.current_frame += 1
@@ -120,7 +138,8 @@ class LearningPhaseManager:
         # FINAL CLEANUP: Verify colors are correct
         self._verify_colors()
         
-        print(f"--- LEARNING FRAME {self.current_frame} END ---")
+        if DEBUG:
+            print(f"--- LEARNING FRAME {self.current_frame} END ---")
         
         return transmission_queue
     
@@ -142,9 +161,9 @@ class LearningPhaseManager:
         actual_targets = set()
         
         for node_id, node in self.network.nodes.items():
-            if node.status_flags[node.STATUS_SOURCE]:
+            if node.has_status(node.STATUS_SOURCE):
                 actual_sources.add(node_id)
-            if node.status_flags[node.STATUS_TARGET]:
+            if node.has_status(node.STATUS_TARGET):
                 actual_targets.add(node_id)
         
         print(f"  Expected sources: {sorted(expected_sources)}")
@@ -171,17 +190,17 @@ class LearningPhaseManager:
         """Start learning messages that should begin this frame"""
         started_messages = []
         
-        for message in self.learning_messages.values():
-            if message.start_frame == (self.current_frame + 1) and not message.is_active:
+        for message in self._messages_by_start_frame.get(self.current_frame + 1, []):
+            if not message.is_active:
                 message.start_transmission()
                 
                 # Mark source and target nodes
                 self.network.nodes[message.source].set_as_source(True)
                 self.network.nodes[message.target].set_as_target(True)
                 
-                # Add message to source node's pending list
+                # Add message to source node's pending list - no hops used yet
                 initial_path = [message.source]
-                self.network.nodes[message.source].pending_messages.append((message, initial_path))
+                self.network.nodes[message.source].pending_messages.append((message, initial_path, message.hop_limit))
                 
                 started_messages.append(message.id)
                 print(f"Started Learning Message {message.id}: {message.source} -> {message.target} (Hop limit: {message.hop_limit})")
@@ -211,9 +230,10 @@ class LearningPhaseManager:
         print(f"Summary: {active_count} active, {waiting_count} waiting, {completed_count} completed")
     
     def _print_learning_progress(self):
-        """Print learning progress and knowledge trees"""
-        print(f"\nLEARNING KNOWLEDGE TREES - End of Frame {self.current_frame}:")
-        print("=" * 70)
+        """Print learning progress - and, with DEBUG, every node's knowledge tree and new entries"""
+        if DEBUG:
+            print(f"\nLEARNING KNOWLEDGE TREES - End of Frame {self.current_frame}:")
+            print("=" * 70)
         
         trees_found = False
         nodes_with_trees = []
@@ -225,21 +245,22 @@ class LearningPhaseManager:
                 trees_found = True
                 nodes_with_trees.append(node_id)
                 
-                # Check for new entries learned this frame
-                new_entries = []
-                for dest, entries_list in node.knowledge_tree.items():
-                    for entry in entries_list:
-                        if entry.get('learned_frame') == self.current_frame:
-                            new_entries.append(dest)
-                
-                if new_entries:
-                    new_entries_this_frame.extend([(node_id, dest) for dest in new_entries])
-                    print(f"\nNode {node_id} Learning Tree (NEW: learned about {new_entries} this frame):")
-                else:
-                    print(f"\nNode {node_id} Learning Tree (no new entries this frame):")
-                
-                node.print_knowledge_tree()
-                print()
+                if DEBUG:
+                    # Check for new entries learned this frame
+                    new_entries = []
+                    for dest, entries_list in node.knowledge_tree.items():
+                        for entry in entries_list:
+                            if entry.learned_frame == self.current_frame:
+                                new_entries.append(dest)
+                    
+                    if new_entries:
+                        new_entries_this_frame.extend([(node_id, dest) for dest in new_entries])
+                        print(f"\nNode {node_id} Learning Tree (NEW: learned about {new_entries} this frame):")
+                    else:
+                        print(f"\nNode {node_id} Learning Tree (no new entries this frame):")
+                    
+                    node.print_knowledge_tree()
+                    print()
         
         if not trees_found:
             print("\n   (No knowledge trees built yet in learning phase)")
@@ -252,43 +273,52 @@ class LearningPhaseManager:
             print(f"\nLearning Progress: {len(nodes_with_trees)}/{len(self.network.nodes)} nodes have built trees")
             print(f"Total destinations learned so far: {total_destinations}")
             
-            if new_entries_this_frame:
-                print(f"New knowledge gained this frame:")
-                for node_id, dest in new_entries_this_frame:
-                    print(f"    Node {node_id} learned about destination {dest}")
-            else:
-                print(f"No new knowledge gained this frame")
+            if DEBUG:
+                if new_entries_this_frame:
+                    print(f"New knowledge gained this frame:")
+                    for node_id, dest in new_entries_this_frame:
+                        print(f"    Node {node_id} learned about destination {dest}")
+                else:
+                    print(f"No new knowledge gained this frame")
         
-        print("=" * 70)
+        if DEBUG:
+            print("=" * 70)
   
-    def _clear_learning_message_status(self, completed_message):
-        """Clear source/target status when learning message completes"""
+    def _live_endpoints(self, excluded_message=None):
+        """Source and target node IDs of all active, not completed learning messages, as two sets"""
+        live_sources = set()
+        live_targets = set()
+        for msg in self.learning_messages.values():
+            if msg.is_active and not msg.is_completed and msg != excluded_message:
+                live_sources.add(msg.source)
+                live_targets.add(msg.target)
+        return live_sources, live_targets
+    
+    def _clear_learning_message_status(self, completed_message, live_endpoints=None):
+        """Clear source/target status when learning message completes
+        
+        live_endpoints is a _live_endpoints() snapshot shared by all messages completing
+        in the same frame; without it one is taken here
+        """
         source_id = completed_message.source
         target_id = completed_message.target
         message_id = completed_message.id
         
         print(f"Clearing status for Learning Message {message_id} ({source_id}->{target_id})")
         
-        # Remove this message from ALL nodes' pending_messages
+        # Remove this message from ALL nodes' pending_messages - only lists holding a copy are rebuilt
         for node in self.network.nodes.values():
-            new_pending = []
-            for pending_item in node.pending_messages:
-                if len(pending_item) == 2:
-                    msg, path = pending_item
-                    if msg.id != message_id:
-                        new_pending.append(pending_item)
-                elif len(pending_item) == 3:
-                    msg, path, hop_limit = pending_item
-                    if msg.id != message_id:
-                        new_pending.append(pending_item)
-            node.pending_messages = new_pending
+            pending = node.pending_messages
+            if pending and any(msg.id == message_id for msg, path, hop_limit in pending):
+                node.pending_messages = [pending_item for pending_item in pending
+                                         if pending_item[0].id != message_id]
+        
+        if live_endpoints is None:
+            live_endpoints = self._live_endpoints(completed_message)
+        live_sources, live_targets = live_endpoints
         
         # Check if source has OTHER active LEARNING messages
-        source_has_other_active = any(
-            msg.is_active and not msg.is_completed and msg.source == source_id 
-            for msg in self.learning_messages.values() 
-            if msg != completed_message
-        )
+        source_has_other_active = source_id in live_sources
         
         print(f"  Source node {source_id}: other active messages = {source_has_other_active}")
         
@@ -297,11 +327,7 @@ class LearningPhaseManager:
             print(f"  Cleared SOURCE color from node {source_id}")
             
         # Check if target has OTHER active LEARNING messages
-        target_has_other_active = any(
-            msg.is_active and not msg.is_completed and msg.target == target_id 
-            for msg in self.learning_messages.values() 
-            if msg != completed_message
-        )
+        target_has_other_active = target_id in live_targets
         
         print(f"  Target node {target_id}: other active messages = {target_has_other_active}")
         
@@ -1,5 +1,8 @@
 import random
 
+# Per-hop path discovery trace output
+DEBUG = False
+
 class Message:
     """
     Represents a message in the network simulation
@@ -44,6 +47,7 @@ class Message:
         
         # Track multiple message paths (flooding creates multiple routes)
         self.paths = []  # List of paths - each path is a list of node IDs
+        self._path_keys = set()  # Tuples of the paths above, for O(1) uniqueness checks
         self.active_copies = {}  # Dictionary: node_id -> path_to_that_node
         
     def start_transmission(self):
@@ -51,6 +55,7 @@ class Message:
         self.is_active = True
         initial_path = [self.source]
         self.paths.append(initial_path)
+        self._path_keys.add(tuple(initial_path))
         self.active_copies[self.source] = initial_path.copy()
         
     def decrease_hop(self):
@@ -102,14 +107,16 @@ class Message:
         Returns:
             new_path: The new path including the receiver
         """
-        # FIXED: Create new path correctly
-        new_path = sender_path.copy()
-        new_path.append(receiver_id)  # Add the receiver to the path
+        # FIXED: Create new path correctly - one allocation, sender's path is never mutated
+        new_path = sender_path + [receiver_id]  # Add the receiver to the path
         
         # Add new path if it's unique
-        if new_path not in self.paths:
+        path_key = tuple(new_path)
+        if path_key not in self._path_keys:
+            self._path_keys.add(path_key)
             self.paths.append(new_path)
-            print(f"        New path discovered: {' -> '.join(map(str, new_path))}")
+            if DEBUG:
+                print(f"        New path discovered: {' -> '.join(map(str, new_path))}")
             
         # Update active copy for this node
         self.active_copies[receiver_id] = new_path
@@ -24,6 +24,8 @@ class Network:
         self.graph = nx.Graph()
         self.nodes = {}
         self.node_positions = {}
+        self.positions = np.empty((0, 2))  # Node coordinates as an (N, 2) array indexed by node ID
+        self.sq_distances = np.empty((0, 0))  # Squared pairwise node distances as an (N, N) array
         
         self.space_size = space_size
         self.communication_radius = 0
@@ -84,6 +86,11 @@ class Network:
                 random.setstate(original_state)
                 np.random.set_state(np_original_state)
                 print(f"✅ Fixed layout created, random state restored")
+        
+        # Keep coordinates in one contiguous array for vectorized distance math
+        self.positions = np.array([self.node_positions[node_id] for node_id in sorted(self.nodes)],
+                                  dtype=float).reshape(-1, 2)
+        self.sq_distances = self._pairwise_sq_distances()
             
     def _create_improved_random_layout(self, num_nodes):
         """Grid-based distribution with randomness within cells
@@ -167,7 +174,7 @@ class Network:
             # Check minimum distance from existing points
             valid = True
             for px, py in positions:
-                if math.sqrt((x - px)**2 + (y - py)**2) < min_distance:
+                if math.hypot(x - px, y - py) < min_distance:
                     valid = False
                     break
             
@@ -192,20 +199,12 @@ class Network:
             random.seed(self.FIXED_SEEDS[len(self.nodes)] + 1000)  # Different seed for radius calc
         
         try:
-            # Calculate all pairwise distances
-            distances = []
-            for i in self.nodes:
-                for j in self.nodes:
-                    if i != j:
-                        pos1 = self.node_positions[i]
-                        pos2 = self.node_positions[j]
-                        distance = math.sqrt((pos1[0] - pos2[0])**2 + (pos1[1] - pos2[1])**2)
-                        distances.append(distance)
-            
-            distances.sort()
+            # All pairwise squared distances between different nodes
+            off_diagonal = ~np.eye(len(self.nodes), dtype=bool)
+            sq_distances = np.sort(self.sq_distances[off_diagonal])
             
-            # Start from first quartile distance
-            initial_radius = distances[len(distances) // 4]
+            # Start from first quartile distance (sqrt is monotonic - only this one is needed)
+            initial_radius = math.sqrt(sq_distances[len(sq_distances) // 4])
             
             # Find radius closest to target neighbor count
             best_radius = initial_radius
@@ -228,21 +227,20 @@ class Network:
         """Calculate average number of neighbors for given radius"""
         if len(self.nodes) == 0:
             return 0
-            
-        total_neighbors = 0
-        for node_id in self.nodes:
-            pos1 = self.node_positions[node_id]
-            neighbors = 0
-            for other_id in self.nodes:
-                if node_id != other_id:
-                    pos2 = self.node_positions[other_id]
-                    distance = math.sqrt((pos1[0] - pos2[0])**2 + (pos1[1] - pos2[1])**2)
-                    if distance <= radius:
-                        neighbors += 1
-            total_neighbors += neighbors
+        
+        # Every node is within radius of itself - exclude those N self-pairs
+        total_neighbors = np.count_nonzero(self.sq_distances <= radius * radius) - len(self.nodes)
         
         return total_neighbors / len(self.nodes)
 
+    def _pairwise_sq_distances(self):
+        """All node-to-node squared distances in one vectorized pass over the positions array
+        
+        Radius tests compare against radius squared, so no square roots are taken
+        """
+        deltas = self.positions[:, None, :] - self.positions[None, :, :]
+        return (deltas * deltas).sum(axis=2)
+
     def create_network_connections(self):
         """Create connections based on communication radius"""
         # Use fixed seed for connection creation to ensure consistent topology
@@ -257,26 +255,22 @@ class Network:
             
             # Clear existing connections
             for node in self.nodes.values():
-                node.neighbors.clear()
+                node.clear_neighbors()
             self.graph.clear_edges()
             
             # Create connections within radius
             for i in self.nodes:
-                pos1 = self.node_positions[i]
-                
                 # Small random variation in radius
                 variation = random.uniform(-self.radius_variation, self.radius_variation)
                 node_radius = self.communication_radius * (1 + variation)
                 
-                for j in self.nodes:
+                # Only visit nodes already known to be in range (ascending node ID)
+                in_range = np.flatnonzero(self.sq_distances[i] <= node_radius * node_radius).tolist()
+                for j in in_range:
                     if i != j and not self.graph.has_edge(i, j):
-                        pos2 = self.node_positions[j]
-                        distance = math.sqrt((pos1[0] - pos2[0])**2 + (pos1[1] - pos2[1])**2)
-                        
-                        if distance <= node_radius:
-                            self.nodes[i].add_neighbor(j)
-                            self.nodes[j].add_neighbor(i)
-                            self.graph.add_edge(i, j)
+                        self.nodes[i].add_neighbor(j)
+                        self.nodes[j].add_neighbor(i)
+                        self.graph.add_edge(i, j)
         finally:
             # Restore random state
             if len(self.nodes) in self.FIXED_SEEDS:
@@ -297,12 +291,11 @@ class Network:
             node.set_as_target(False)
             node.pending_messages.clear()
             node.received_messages.clear()
-            if hasattr(node, 'seen_message_copies'):
-                node.seen_message_copies.clear()
-            if hasattr(node, 'received_message_ids'):
-                node.received_message_ids.clear()
+            node.seen_message_copies.clear()
+            node.received_message_ids.clear()
+            node.message_frames.clear()
             # RESET KNOWLEDGE TREES
-            node.knowledge_tree.clear()
+            node.clear_knowledge_tree()
 
     def print_network_summary(self):
         """Print network statistics"""
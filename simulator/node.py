@@ -1,85 +1,170 @@
+import hashlib
+import math
+from collections import namedtuple
+from enum import IntEnum
+
+
+# Per-message routing and tree-building trace output (print_knowledge_tree always prints)
+DEBUG = False
+
+
+# One learned route to a destination in a node's knowledge tree
+# (phase is "learning" or "comparison" - the phase whose frame counter learned_frame comes from)
+TreeEntry = namedtuple('TreeEntry', ['parent', 'distance', 'learned_frame', 'next_hop', 'phase'])
+
+
+class Color(IntEnum):
+    """Display color of a node - renderers map these to their own color values"""
+    LIGHTBLUE = 0
+    GREEN = 1
+    RED = 2
+    PINK = 3
+    ORANGE = 4
+
+
 class Node:
     """
     Represents a node in the network
     Each node has status, position, and message handling capabilities
     Now with Tree Building capabilities and Tree-Based Routing
     """
+
+    # Fixed attribute layout - no per-instance __dict__
+    __slots__ = (
+        'id', 'x', 'y', '_status',
+        'pending_messages', 'received_messages',
+        'received_message_ids', 'seen_message_copies',
+        'neighbors', '_neighbors_cached',
+        'knowledge_tree', '_parents_of', '_children_of', '_bucket_cache',
+        '_summary_distances', '_summary_next_hops', '_tree_summary',
+        'oldest_learned_frame', 'message_frames',
+    )
+
+    # Node status bits - combined into a single integer bitmask per node
+    STATUS_NORMAL = 1 << 0
+    STATUS_COLLISION = 1 << 1
+    STATUS_SOURCE = 1 << 2
+    STATUS_TARGET = 1 << 3
+    STATUS_SENDING = 1 << 4
+    STATUS_RECEIVING = 1 << 5
+    
+    # Bits that survive reset_frame_status (everything except the per-frame ones)
+    STATUS_KEEP_MASK = ~(STATUS_COLLISION | STATUS_SENDING | STATUS_RECEIVING)
+    
+    # Status names for display, in reporting order
+    STATUS_NAMES = (
+        (STATUS_NORMAL, "normal"),
+        (STATUS_COLLISION, "collision"),
+        (STATUS_SOURCE, "source"),
+        (STATUS_TARGET, "target"),
+        (STATUS_SENDING, "sending"),
+        (STATUS_RECEIVING, "receiving"),
+    )
     
-    # Node status constants
-    STATUS_NORMAL = "normal"
-    STATUS_COLLISION = "collision"
-    STATUS_SOURCE = "source" 
-    STATUS_TARGET = "target"
-    STATUS_SENDING = "sending"
-    STATUS_RECEIVING = "receiving"  
+    # Knowledge-tree entries and message IDs older than this many frames are evicted.
+    # Each phase counts frames from 1, so only entries learned during the comparison phase
+    # are aged - the topology learned in the learning phase is never evicted
+    TREE_TTL_FRAMES = 1000
+    
+    # Flooding fanout: None sends to every neighbor (pure flooding), an int K or "sqrt"
+    # (K = ceil(sqrt(degree))) forwards to a deterministic K-of-N subset per message.
+    # Comparison phase only - learning always floods fully so the knowledge trees are complete
+    FLOOD_FANOUT = None
+    
+    # Hop-decay probabilistic flooding: a relay forwards with probability
+    # FORWARD_PROB_BASE * FORWARD_PROB_FACTOR ** hops_used (None = always forward).
+    # Comparison phase only, and the source always sends its own message
+    FORWARD_PROB_BASE = None
+    FORWARD_PROB_FACTOR = 0.90
     
     def __init__(self, node_id, x_pos, y_pos):
         self.id = node_id
         self.x = x_pos
         self.y = y_pos
         
-        # Node status
-        self.status_flags = {
-            self.STATUS_NORMAL: True,
-            self.STATUS_COLLISION: False,
-            self.STATUS_SOURCE: False,
-            self.STATUS_TARGET: False,
-            self.STATUS_SENDING: False,
-            self.STATUS_RECEIVING: False 
-        }
+        # Node status bitmask (see STATUS_* bits)
+        self._status = self.STATUS_NORMAL
         
         # Messages
         self.pending_messages = []
         self.received_messages = []
-        self.seen_message_ids = set()
         self.received_message_ids = set()
+        self.seen_message_copies = set()  # (message_id, sender_id) pairs already accepted
         
         # Neighbors
         self.neighbors = set()
+        self._neighbors_cached = None  # Tuple snapshot of neighbors, rebuilt after changes
         
         # TREE STRUCTURE: Each node builds a tree of known paths
         # Each destination can have multiple entries (different paths)
-        self.knowledge_tree = {}  # {destination_node: [list of path entries]}
+        self.knowledge_tree = {}  # {destination_node: [list of TreeEntry]}
+        self._parents_of = {}  # {destination_node: set of parents across its entries}
+        self._children_of = {}  # {parent: set of destinations with an entry under it}
+        self._bucket_cache = {}  # {node: frozenset of direct children whose subtree holds it}
+        
+        # Deduplicated per-destination distances and next hops, kept in step with the tree
+        self._summary_distances = {}  # {destination_node: set of distances}
+        self._summary_next_hops = {}  # {destination_node: set of next hops}
+        self._tree_summary = None  # Cached get_tree_summary() text, None when stale
+        
+        # Sliding-window bookkeeping for evicting stale tree entries and message IDs
+        self.oldest_learned_frame = None  # Smallest learned_frame among evictable (comparison) entries
+        self.message_frames = {}  # {message_id: last frame this node processed it}
         
     def reset_frame_status(self):
         """Reset status flags that change each frame"""
-        self.status_flags[self.STATUS_COLLISION] = False
-        self.status_flags[self.STATUS_SENDING] = False
-        self.status_flags[self.STATUS_RECEIVING] = False
+        self._status &= self.STATUS_KEEP_MASK
         self.received_messages.clear()
     
     def add_neighbor(self, neighbor_id):
         """Add a neighbor node"""
         self.neighbors.add(neighbor_id)
+        self._neighbors_cached = None
+        
+    def clear_neighbors(self):
+        """Remove all neighbor connections"""
+        self.neighbors.clear()
+        self._neighbors_cached = None
+        
+    @property
+    def neighbors_list(self):
+        """Neighbors as a cached tuple - avoids building a new list per routing decision"""
+        if self._neighbors_cached is None:
+            self._neighbors_cached = tuple(self.neighbors)
+        return self._neighbors_cached
+        
+    def has_status(self, status):
+        """Check whether a STATUS_* bit is set on this node"""
+        return bool(self._status & status)
         
     def set_as_source(self, is_source=True):
         """Mark node as message source"""
-        self.status_flags[self.STATUS_SOURCE] = is_source
+        if is_source:
+            self._status |= self.STATUS_SOURCE
+        else:
+            self._status &= ~self.STATUS_SOURCE
         
     def set_as_target(self, is_target=True):
         """Mark node as message target"""
-        self.status_flags[self.STATUS_TARGET] = is_target
+        if is_target:
+            self._status |= self.STATUS_TARGET
+        else:
+            self._status &= ~self.STATUS_TARGET
         
     def set_collision(self):
         """Mark node as having collision this frame"""
-        self.status_flags[self.STATUS_COLLISION] = True
+        self._status |= self.STATUS_COLLISION
         
     def set_sending(self):
         """Mark node as sending this frame"""
-        self.status_flags[self.STATUS_SENDING] = True
+        self._status |= self.STATUS_SENDING
         
     def set_receiving(self):
         """Mark node as receiving a message this frame"""
-        self.status_flags[self.STATUS_RECEIVING] = True
+        self._status |= self.STATUS_RECEIVING
        
     def receive_message_copy(self, message, sender_id, sender_path):
         """Receive a specific copy of a message with its path"""
-        # Initialize sets if they don't exist
-        if not hasattr(self, 'received_message_ids'):
-            self.received_message_ids = set()
-        if not hasattr(self, 'seen_message_copies'):
-            self.seen_message_copies = set()
-        
         # Check for exact duplicate from same sender
         message_key = (message.id, sender_id)
         if message_key in self.seen_message_copies:
@@ -90,236 +175,375 @@ class Node:
         
         # Check if we've processed this message before
         if message.id in self.received_message_ids:
-            print(f"      Node {self.id} received Message {message.id} again - already processed, won't forward")
+            if DEBUG:
+                print(f"      Node {self.id} received Message {message.id} again - already processed, won't forward")
             return True  # Received, just won't propagate
         
         # First time seeing this message - accept and add for processing
         self.received_messages.append((message, sender_id, sender_path))
         self.received_message_ids.add(message.id)
-        print(f"      Node {self.id} received NEW Message {message.id} - will process and forward")
+        if DEBUG:
+            print(f"      Node {self.id} received NEW Message {message.id} - will process and forward")
         
         return True
     
-    def get_routing_decision(self, message, hop_limit_remaining, algorithm_mode="flooding"):
-        """Routing decision based on selected algorithm"""
+    def get_routing_decision(self, message, hop_limit_remaining, algorithm_mode="flooding", message_type="comparison"):
+        """Routing decision based on selected algorithm and phase ("learning" or "comparison")"""
         source = message.source
         target = message.target
         
         # FIRST CHECK: If I'm the target, never forward (for both algorithms)
         if target == self.id:
-            if algorithm_mode == "flooding":
-                print(f"Node {self.id} flooding decision for Message {message.id} ({source}->{target}):")
+            if DEBUG:
+                decision_name = "flooding" if algorithm_mode == "flooding" else "tree-based"
+                print(f"Node {self.id} {decision_name} decision for Message {message.id} ({source}->{target}):")
                 print(f"   I AM THE TARGET - not forwarding")
-            else:
-                print(f"Node {self.id} tree-based decision for Message {message.id} ({source}->{target}):")
-                print(f"   I AM THE TARGET - not forwarding")
-            return []
+            return ()
         
         if algorithm_mode == "flooding":
-            return self._flooding_decision(message, hop_limit_remaining)
+            return self._flooding_decision(message, hop_limit_remaining, message_type)
         else:
             return self._tree_based_decision(message, hop_limit_remaining)
     
-    def _flooding_decision(self, message, hop_limit_remaining):
+    def _flooding_decision(self, message, hop_limit_remaining, message_type="comparison"):
         """FLOODING ALGORITHM: Send to all neighbors (except if I'm target)"""
         source = message.source
         target = message.target
         
-        print(f"Node {self.id} flooding decision for Message {message.id} ({source}->{target}):")
-        print(f"   Hop limit remaining: {hop_limit_remaining}")
-        print(f"   Decision: PURE FLOODING to all neighbors {list(self.neighbors)}")
+        if (self.FORWARD_PROB_BASE is not None and message_type == "comparison"
+                and not self._should_forward(message, hop_limit_remaining, message_type)):
+            if DEBUG:
+                print(f"Node {self.id} flooding decision for Message {message.id} ({source}->{target}):")
+                print(f"   Hop limit remaining: {hop_limit_remaining}")
+                print(f"   Decision: DON'T SEND - probabilistic forwarding suppressed this hop")
+            return ()
+        
+        if self.FLOOD_FANOUT is not None and message_type == "comparison":
+            chosen = self._fanout_neighbors(message)
+            if DEBUG:
+                print(f"Node {self.id} flooding decision for Message {message.id} ({source}->{target}):")
+                print(f"   Hop limit remaining: {hop_limit_remaining}")
+                print(f"   Decision: LIMITED FLOODING to {list(chosen)} of neighbors {list(self.neighbors_list)}")
+            return chosen
+        
+        if DEBUG:
+            print(f"Node {self.id} flooding decision for Message {message.id} ({source}->{target}):")
+            print(f"   Hop limit remaining: {hop_limit_remaining}")
+            print(f"   Decision: PURE FLOODING to all neighbors {list(self.neighbors_list)}")
         
         # Always return all neighbors - pure flooding
-        return list(self.neighbors)
+        return self.neighbors_list
+    
+    def _should_forward(self, message, hop_limit_remaining, message_type="comparison"):
+        """Hop-decay coin flip - deterministic per (phase, message, node) so reruns match"""
+        hops_used = message.hop_limit - hop_limit_remaining
+        if hops_used == 0:
+            return True  # The originator always sends - only relays flip the coin
+        forward_probability = self.FORWARD_PROB_BASE * (self.FORWARD_PROB_FACTOR ** hops_used)
+        
+        # Uniform draw in [0, 1) from a hash instead of a shared RNG stream
+        digest = hashlib.blake2b(f"forward:{message_type}:{message.id}:{self.id}".encode(), digest_size=8).digest()
+        draw = int.from_bytes(digest, "big") / 2 ** 64
+        return draw < forward_probability
+
+    def _fanout_neighbors(self, message):
+        """Pick FLOOD_FANOUT neighbors - always the same ones for a given message at this node"""
+        neighbors = self.neighbors_list
+        if self.FLOOD_FANOUT == "sqrt":
+            fanout = math.ceil(math.sqrt(len(neighbors)))
+        else:
+            fanout = self.FLOOD_FANOUT
+        if fanout >= len(neighbors):
+            return neighbors
+        
+        # Rank neighbors by a hash of (message, me, neighbor) so each relay picks its own subset
+        ranked = sorted(neighbors, key=lambda neighbor_id: hashlib.blake2b(
+            f"{message.id}:{self.id}:{neighbor_id}".encode(), digest_size=8).digest())
+        return tuple(ranked[:fanout])
     
     def _tree_based_decision(self, message, hop_limit_remaining):
         """TREE-BASED ALGORITHM: Use knowledge tree for smart routing"""
         source = message.source
         target = message.target
         
-        print(f"Node {self.id} tree-based decision for Message {message.id} ({source}->{target}):")
-        print(f"   Hop limit remaining: {hop_limit_remaining}")
+        if DEBUG:
+            print(f"Node {self.id} tree-based decision for Message {message.id} ({source}->{target}):")
+            print(f"   Hop limit remaining: {hop_limit_remaining}")
         
         # Check if both source and target are in my knowledge tree
         source_in_tree = source in self.knowledge_tree
         target_in_tree = target in self.knowledge_tree
         
-        print(f"   Source {source} in tree: {source_in_tree}")
-        print(f"   Target {target} in tree: {target_in_tree}")
+        if DEBUG:
+            print(f"   Source {source} in tree: {source_in_tree}")
+            print(f"   Target {target} in tree: {target_in_tree}")
         
         # If I don't know about both source and target, flood to all neighbors
         if not (source_in_tree and target_in_tree):
-            print(f"   Decision: FLOOD (missing knowledge) to all neighbors {list(self.neighbors)}")
-            return list(self.neighbors)
+            if DEBUG:
+                print(f"   Decision: FLOOD (missing knowledge) to all neighbors {list(self.neighbors_list)}")
+            return self.neighbors_list
         
         # Both source and target are in my tree - check if they're in same subtree
-        print(f"   Both source and target known - checking subtrees...")
+        if DEBUG:
+            print(f"   Both source and target known - checking subtrees...")
         
         # Check if source and target are in the same subtree
         if self._are_in_same_subtree(source, target):
-            print(f"   Decision: DON'T SEND - source and target in same subtree")
-            print(f"      → There's a path {source}->{target} that doesn't go through me")
-            return []  # Don't send to anyone
+            if DEBUG:
+                print(f"   Decision: DON'T SEND - source and target in same subtree")
+                print(f"      → There's a path {source}->{target} that doesn't go through me")
+            return ()  # Don't send to anyone
         else:
             # They're in different subtrees - flood to all neighbors
-            print(f"   Decision: FLOOD (different subtrees) to all neighbors {list(self.neighbors)}")
-            return list(self.neighbors)
+            if DEBUG:
+                print(f"   Decision: FLOOD (different subtrees) to all neighbors {list(self.neighbors_list)}")
+            return self.neighbors_list
 
     def _are_in_same_subtree(self, source, target):
         """Check if source and target are in the same subtree"""
+        source_buckets = self._subtree_buckets(source)
+        target_buckets = self._subtree_buckets(target)
+        
+        if DEBUG:
+            print(f"      Source {source} in subtrees of children: {sorted(source_buckets)}")
+            print(f"      Target {target} in subtrees of children: {sorted(target_buckets)}")
+        
+        # If ANY direct child's subtree contains both source and target, they share a subtree
+        shared = source_buckets & target_buckets
+        if shared:
+            if DEBUG:
+                print(f"      Both source and target found in subtree of child {min(shared)}")
+            return True
         
-        # Get all my direct children in the tree
-        my_direct_children = self._get_direct_children()
-        
-        print(f"      My direct children: {my_direct_children}")
-        
-        # Check each subtree - if ANY subtree contains both source and target, return True
-        for child in my_direct_children:
-            source_in_subtree = self._is_in_subtree(source, child)
-            target_in_subtree = self._is_in_subtree(target, child)
-            
-            print(f"      Child {child}: source({source})={source_in_subtree}, target({target})={target_in_subtree}")
-            
-            if source_in_subtree and target_in_subtree:
-                print(f"      Both source and target found in subtree of child {child}")
-                return True
-        
-        print(f"      No single subtree contains both source and target")
+        if DEBUG:
+            print(f"      No single subtree contains both source and target")
         return False
 
     def _get_direct_children(self):
         """Get all direct children of this node in the knowledge tree"""
-        direct_children = []
-        for dest, entries_list in self.knowledge_tree.items():
-            for entry in entries_list:
-                if entry['parent'] == self.id and dest not in direct_children:
-                    direct_children.append(dest)
-        return direct_children
+        return self._children_of.get(self.id, frozenset())
 
-    def _is_in_subtree(self, node, subtree_root):
-        """Check if a node is in the subtree rooted at subtree_root"""
-        print(f"        Checking if {node} is in subtree of {subtree_root}")
-        
-        # The subtree root is always in its own subtree
-        if node == subtree_root:
-            print(f"        {node} IS the root {subtree_root}")
-            return True
-        
-        # Check if node exists in my knowledge tree
-        if node not in self.knowledge_tree:
-            print(f"        {node} not in knowledge tree at all")
-            return False
+    def _subtree_buckets(self, node):
+        """Get the set of direct children whose subtree contains node
+        
+        Walks every parent entry from node back towards me once and caches the
+        result, so repeated routing decisions answer subtree questions with a
+        dictionary lookup. The cache is cleared whenever a parent edge is added
+        or evicted.
+        """
+        buckets = self._bucket_cache.get(node)
+        if buckets is not None:
+            return buckets
         
-        # Simple approach: check if any entry of this node has subtree_root as parent
-        # OR if any path from node back to ME goes through subtree_root
-        visited = set()
-        nodes_to_check = [node]
-        
-        while nodes_to_check:
-            current = nodes_to_check.pop(0)
-            
-            if current in visited:
-                continue
-            visited.add(current)
-            
-            if current == subtree_root:
-                print(f"        Found {subtree_root} in path from {node}")
-                return True
+        if node in self.knowledge_tree:
+            direct_children = self._get_direct_children()
             
-            if current == self.id:
-                continue
-                
-            # Get all parents of current node
-            if current in self.knowledge_tree:
-                for entry in self.knowledge_tree[current]:
-                    parent = entry['parent']
+            # Collect every node reachable through parent entries (never past me)
+            visited = {node}
+            nodes_to_check = [node]
+            while nodes_to_check:
+                current = nodes_to_check.pop()
+                if current == self.id or current not in self.knowledge_tree:
+                    continue
+                for parent in self._parents_of[current]:
                     if parent not in visited:
+                        visited.add(parent)
                         nodes_to_check.append(parent)
+            
+            buckets = frozenset(visited & direct_children)
+        else:
+            buckets = frozenset()
         
-        print(f"        {node} NOT found in subtree of {subtree_root}")
-        return False
+        self._bucket_cache[node] = buckets
+        return buckets
 
-    def build_knowledge_tree_from_message(self, message_source, path, current_frame):
-        """Build knowledge tree from received message path - learn ALL paths, store multiple entries per destination"""
+    def build_knowledge_tree_from_message(self, message_source, path, current_frame, my_index=None):
+        """Build knowledge tree from received message path - learn ALL paths, store multiple entries per destination
+        
+        my_index is my (first) position in path; callers that already know it skip the search
+        """
         if len(path) < 2:
             return  # No tree info to learn
         
         # Find my position in the path
-        try:
-            my_index = path.index(self.id)
-        except ValueError:
-            print(f"      WARNING: Node {self.id} not found in path {path}")
-            return
-        
-        print(f"      Node {self.id} building tree from path: {' -> '.join(map(str, path))}")
+        if my_index is None:
+            try:
+                my_index = path.index(self.id)
+            except ValueError:
+                print(f"      WARNING: Node {self.id} not found in path {path}")
+                return
+        
+        self._learn_path(path, my_index, current_frame)
+
+    def _learn_path(self, path, my_index, current_frame, phase="comparison"):
+        """Add tree entries for every node before my_index in path, learned in the given phase"""
+        if DEBUG:
+            print(f"      Node {self.id} building tree from path: {' -> '.join(map(str, path))}")
         
         # Build tree by learning the REVERSE path (from me back to source)
         # This creates a tree showing how to reach all nodes in the path
-        for i in range(my_index):
-            target_node = path[i]
-            distance_to_target = my_index - i
-            
-            # The next hop is always my direct neighbor in the path (the one who sent me the message)
-            next_hop = path[my_index - 1] if my_index > 0 else None
-            
-            # The parent in the tree is the next node in the path towards the target
-            if distance_to_target == 1:
-                # Direct neighbor
-                parent_in_tree = self.id
-            else:
-                # The parent is the next node in the path towards the target
-                parent_in_tree = path[i + 1]
-            
+        # The next hop is always my direct neighbor in the path (the one who sent me the message)
+        next_hop = path[my_index - 1] if my_index > 0 else None
+        
+        # The parent in the tree is the next node in the path towards the target
+        # (path[my_index] is me, so a direct neighbor gets me as parent)
+        distance_to_target = my_index
+        new_parent_edge = False
+        knowledge_tree = self.knowledge_tree
+        parents_of = self._parents_of
+        summary_distances = self._summary_distances
+        for target_node, parent_in_tree in zip(path[:my_index], path[1:my_index + 1]):
             # Create new entry
-            new_entry = {
-                'parent': parent_in_tree,
-                'distance': distance_to_target,
-                'learned_frame': current_frame,
-                'next_hop': next_hop
-            }
+            new_entry = TreeEntry(parent_in_tree, distance_to_target, current_frame, next_hop, phase)
             
             # ADD to knowledge tree - keep multiple entries per destination
-            if target_node not in self.knowledge_tree:
-                self.knowledge_tree[target_node] = []
+            knowledge_tree.setdefault(target_node, []).append(new_entry)
+            parents = parents_of.setdefault(target_node, set())
+            if parent_in_tree not in parents:
+                parents.add(parent_in_tree)
+                self._children_of.setdefault(parent_in_tree, set()).add(target_node)
+                new_parent_edge = True
+            distances = summary_distances.setdefault(target_node, set())
+            if distance_to_target not in distances:
+                distances.add(distance_to_target)
+                self._tree_summary = None
+            if next_hop:
+                next_hops = self._summary_next_hops.setdefault(target_node, set())
+                if next_hop not in next_hops:
+                    next_hops.add(next_hop)
+                    self._tree_summary = None
+            if DEBUG:
+                print(f"         Tree entry added: {target_node} (distance: {distance_to_target}, parent: {parent_in_tree})")
+            distance_to_target -= 1
+        
+        # Subtree answers only depend on parent edges - keep them unless one was added
+        if new_parent_edge:
+            self._bucket_cache.clear()
+        
+        if phase != "learning" and (self.oldest_learned_frame is None or current_frame < self.oldest_learned_frame):
+            self.oldest_learned_frame = current_frame
+
+    def clear_knowledge_tree(self):
+        """Forget everything learned into the knowledge tree"""
+        self.knowledge_tree.clear()
+        self._parents_of.clear()
+        self._children_of.clear()
+        self.oldest_learned_frame = None
+        self._bucket_cache.clear()
+        self._summary_distances.clear()
+        self._summary_next_hops.clear()
+        self._tree_summary = None
+
+    def _evict_stale(self, current_frame):
+        """Drop comparison-phase tree entries and message IDs not refreshed within TREE_TTL_FRAMES"""
+        cutoff = current_frame - self.TREE_TTL_FRAMES
+        
+        # Nothing in the tree is old enough - skip the full walk
+        if self.oldest_learned_frame is None or self.oldest_learned_frame >= cutoff:
+            return
+        
+        oldest = None
+        for dest in list(self.knowledge_tree):
+            entries_list = self.knowledge_tree[dest]
+            fresh_entries = [entry for entry in entries_list
+                             if entry.phase == "learning" or entry.learned_frame >= cutoff]
+            if not fresh_entries:
+                del self.knowledge_tree[dest]
+                self._drop_parent_edges(dest, self._parents_of.pop(dest))
+                del self._summary_distances[dest]
+                self._summary_next_hops.pop(dest, None)
+                continue
+            
+            if len(fresh_entries) < len(entries_list):
+                # Some entries expired - rebuild this destination's summary sets
+                self.knowledge_tree[dest] = fresh_entries
+                self._summary_distances[dest] = {entry.distance for entry in fresh_entries}
+                next_hops = {entry.next_hop for entry in fresh_entries if entry.next_hop}
+                if next_hops:
+                    self._summary_next_hops[dest] = next_hops
+                else:
+                    self._summary_next_hops.pop(dest, None)
+                parents = {entry.parent for entry in fresh_entries}
+                self._drop_parent_edges(dest, self._parents_of[dest] - parents)
+                self._parents_of[dest] = parents
             
-            self.knowledge_tree[target_node].append(new_entry)
-            print(f"         Tree entry added: {target_node} (distance: {distance_to_target}, parent: {parent_in_tree})")
+            dest_oldest = min((entry.learned_frame for entry in fresh_entries if entry.phase != "learning"),
+                              default=None)
+            if dest_oldest is not None and (oldest is None or dest_oldest < oldest):
+                oldest = dest_oldest
+        self.oldest_learned_frame = oldest
+        self._bucket_cache.clear()
+        self._tree_summary = None
+        
+        # Forget message IDs (and their per-sender copies) that went quiet long ago
+        stale_ids = {msg_id for msg_id, frame in self.message_frames.items() if frame < cutoff}
+        if stale_ids:
+            for msg_id in stale_ids:
+                del self.message_frames[msg_id]
+            self.received_message_ids -= stale_ids
+            self.seen_message_copies -= {key for key in self.seen_message_copies if key[0] in stale_ids}
 
-    def process_received_messages(self, current_frame=0):
+    def _drop_parent_edges(self, dest, parents):
+        """Remove dest from the child sets of the given parents"""
+        for parent in parents:
+            children = self._children_of[parent]
+            children.discard(dest)
+            if not children:
+                del self._children_of[parent]
+
+    def drain_pending_messages(self):
+        """Hand over everything queued for sending and start an empty queue"""
+        pending = self.pending_messages
+        self.pending_messages = []
+        return pending
+
+    def process_received_messages(self, current_frame=0, message_type="comparison"):
         """Process all message copies received this frame with tree building"""
         processed_messages = []
         for message, sender_id, sender_path in self.received_messages:
 
             # Create new path
             new_path = message.create_new_copy(sender_id, self.id, sender_path)
+            hops_used = len(new_path) - 1
+            
+            # I was just appended to the path - the only earlier spot I can hold is
+            # the start, when a source hears its own learning message echo back
+            my_index = 0 if new_path[0] == self.id else hops_used
             
-            # BUILD TREE: Update knowledge tree from this message
-            self.build_knowledge_tree_from_message(message.source, new_path, current_frame)
+            # BUILD TREE: Update knowledge tree from this message (path always has sender + me)
+            self._learn_path(new_path, my_index, current_frame, message_type)
+            self.message_frames[message.id] = current_frame
             
             # Calculate hop limit
-            hops_used = len(new_path) - 1
             local_hop_limit = message.hop_limit - hops_used
             
-            print(f"      Node {self.id}: Path={' -> '.join(map(str, new_path))}, Hops used={hops_used}, Remaining={local_hop_limit}")
+            if DEBUG:
+                print(f"      Node {self.id}: Path={' -> '.join(map(str, new_path))}, Hops used={hops_used}, Remaining={local_hop_limit}")
             
             # Check if target
             if message.target == self.id:
                 if not message.target_received:
                     message.target_reached()
-                    print(f"      Message {message.id} reached target {self.id} - but continues flooding")
-                else:
+                    if DEBUG:
+                        print(f"      Message {message.id} reached target {self.id} - but continues flooding")
+                elif DEBUG:
                     print(f"      Message {message.id} target already reached, continues flooding")
                 
             # Check hop limit
             if local_hop_limit <= 0:
                 if not message.is_completed:
                     message.complete_message("hop_limit_exceeded")
-                    print(f"      Message {message.id} hop limit exceeded at node {self.id}")
-                processed_messages.append((message, new_path))
+                    if DEBUG:
+                        print(f"      Message {message.id} hop limit exceeded at node {self.id}")
             else:
                 self.pending_messages.append((message, new_path, local_hop_limit))
-                print(f"      Message {message.id} added to pending (local hops left: {local_hop_limit})")
-                processed_messages.append((message, new_path))
+                if DEBUG:
+                    print(f"      Message {message.id} added to pending (local hops left: {local_hop_limit})")
+            processed_messages.append((message, new_path))
+        
+        # Keep tree and dedup state bounded to a sliding window of recent frames
+        self._evict_stale(current_frame)
                     
         return processed_messages
     
@@ -338,88 +562,82 @@ class Node:
         # Start from myself as root
         print(f"         {self.id} (ME)")
         
-        # Find all direct children (nodes with parent = me) - check all entries
-        direct_children = []
-        for node, entries_list in self.knowledge_tree.items():
-            for entry in entries_list:
-                if entry['parent'] == self.id and node not in direct_children:
-                    direct_children.append(node)
-        
         # Sort for consistent output
-        direct_children.sort()
+        direct_children = sorted(self._get_direct_children())
         
         # Print each direct child and its subtree
         for i, child in enumerate(direct_children):
             is_last = (i == len(direct_children) - 1)
-            self._print_subtree(child, "", is_last, set(), [])
+            self._print_subtree(child, "", is_last)
     
-    def _print_subtree(self, node, prefix, is_last, printed_in_this_path, full_path):
+    def _print_subtree(self, root, prefix, is_last):
         """Print a subtree starting from given node - allow same node in different paths"""
-        
-        # Check for cycles in current path only
-        if node in full_path:
-            return
-        
-        current_path = full_path + [node]
-        
-        # Print current node with all its distances
-        connector = "└── " if is_last else "├── "
-        
-        if node in self.knowledge_tree:
-            distances = [entry['distance'] for entry in self.knowledge_tree[node]]
-            distances_str = f"d:{','.join(map(str, sorted(set(distances))))}"
-        else:
-            distances_str = "d:?"
+        # EXPLICIT STACK INSTEAD OF RECURSION - EACH ITEM CARRIES ITS OWN PATH
+        stack = [(root, prefix, is_last, ())]
+        while stack:
+            node, prefix, is_last, full_path = stack.pop()
+            current_path = full_path + (node,)
             
-        print(f"         {prefix}{connector}{node} ({distances_str})")
-        
-        # Find ALL children of this node from ALL entries - DON'T skip duplicates
-        children = []
-        for other_node, entries_list in self.knowledge_tree.items():
-            for entry in entries_list:
-                if entry['parent'] == node and other_node not in current_path:
-                    if other_node not in [child[0] for child in children]:
-                        children.append((other_node, entry))
-        
-        # Sort children for consistent output
-        children.sort(key=lambda x: x[0])
-        
-        # Print each child
-        for i, (child, entry) in enumerate(children):
-            is_child_last = (i == len(children) - 1)
+            # Print current node with all its distances
+            connector = "└── " if is_last else "├── "
+            
+            if node in self.knowledge_tree:
+                distances_str = f"d:{','.join(map(str, sorted(self._summary_distances[node])))}"
+            else:
+                distances_str = "d:?"
+                
+            print(f"         {prefix}{connector}{node} ({distances_str})")
+            
+            # Children of this node from ALL entries, skipping cycles in current path only
+            children = sorted(self._children_of.get(node, frozenset()).difference(current_path))
+            
+            # Push in reverse so the smallest child is printed first
             child_prefix = prefix + ("    " if is_last else "│   ")
-            self._print_subtree(child, child_prefix, is_child_last, set(), current_path)
+            for i in range(len(children) - 1, -1, -1):
+                stack.append((children[i], child_prefix, i == len(children) - 1, current_path))
 
     def get_tree_summary(self):
         """Get a summary of the knowledge tree for display"""
         if not self.knowledge_tree:
             return "Empty tree"
         
-        summary_lines = []
-        for dest, entries_list in sorted(self.knowledge_tree.items()):
-            distances = [entry['distance'] for entry in entries_list]
-            next_hops = [entry['next_hop'] for entry in entries_list if entry['next_hop']]
-            distances_str = ','.join(map(str, sorted(set(distances))))
-            next_hops_str = ','.join(map(str, sorted(set(next_hops))))
-            summary_lines.append(f"->{dest} (d:{distances_str}, via:{next_hops_str})")
+        # Rebuilt only after a new destination, distance or next hop was learned
+        if self._tree_summary is None:
+            summary_lines = []
+            for dest in sorted(self.knowledge_tree):
+                distances_str = ','.join(map(str, sorted(self._summary_distances[dest])))
+                next_hops_str = ','.join(map(str, sorted(self._summary_next_hops.get(dest, ()))))
+                summary_lines.append(f"->{dest} (d:{distances_str}, via:{next_hops_str})")
+            self._tree_summary = " | ".join(summary_lines)
         
-        return " | ".join(summary_lines)
+        return self._tree_summary
 
     def get_display_color(self):
-        """Get the color for displaying this node"""
-        if self.status_flags[self.STATUS_SOURCE] :
-            return "green"
-        elif self.status_flags[self.STATUS_TARGET]:
-            return "red"
-        elif self.status_flags[self.STATUS_COLLISION]:
-            return "pink"
-        elif self.status_flags[self.STATUS_SENDING]:
-            return "orange"
+        """Get the color for displaying this node (a Color value)"""
+        return self._STATUS_COLORS[self._status]
+    
+    @classmethod
+    def _color_for_status(cls, status):
+        """Color for a status bitmask - source wins over target, collision, then sending"""
+        if status & cls.STATUS_SOURCE:
+            return Color.GREEN
+        elif status & cls.STATUS_TARGET:
+            return Color.RED
+        elif status & cls.STATUS_COLLISION:
+            return Color.PINK
+        elif status & cls.STATUS_SENDING:
+            return Color.ORANGE
         else:
-            return "lightblue"
+            return Color.LIGHTBLUE
             
     def __str__(self):
         """String representation of the node"""
-        active_statuses = [status for status, active in self.status_flags.items() if active and status != self.STATUS_NORMAL]
+        active_statuses = [name for status, name in self.STATUS_NAMES
+                           if self._status & status and status != self.STATUS_NORMAL]
         tree_summary = self.get_tree_summary()
-        return f"Node {self.id} at ({self.x:.1f}, {self.y:.1f}) | Status: {active_statuses} | Tree: {tree_summary}"
\ No newline at end of file
+        return f"Node {self.id} at ({self.x:.1f}, {self.y:.1f}) | Status: {active_statuses} | Tree: {tree_summary}"
+
+
+# Display color for every possible status bitmask, so get_display_color is one lookup
+Node._STATUS_COLORS = tuple(Node._color_for_status(status)
+                            for status in range(Node.STATUS_RECEIVING << 1))
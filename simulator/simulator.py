@@ -39,6 +39,7 @@ class Simulator:
         # Create network
         self.network.create_nodes(num_nodes)
         self.network.create_network_connections()
+        self.display_manager.cache_network_geometry()
         
         # Print basic setup summary
         self._print_basic_setup_summary()
@@ -693,11 +694,15 @@ class Simulator:
             # Execute learning frame logic without display
             self.learning_manager._start_learning_messages_for_frame()
             transmission_queue, _, _, completed_messages = \
-                self.message_processor.process_transmissions(self.learning_manager.learning_messages, "learning")
+                self.message_processor.process_transmissions(self.learning_manager.learning_messages, "learning",
+                                                             current_frame=self.learning_manager.current_frame + 1,
+                                                             endpoint_index=(self.learning_manager.messages_by_source,
+                                                                             self.learning_manager.messages_by_target))
             
             # Clean up completed messages
+            live_endpoints = self.learning_manager._live_endpoints()
             for message in completed_messages:
-                self.learning_manager._clear_learning_message_status(message)
+                self.learning_manager._clear_learning_message_status(message, live_endpoints)
             
             self.learning_manager.current_frame += 1
             
@@ -809,7 +814,7 @@ class Simulator:
         
         # Check completion
         if self.comparison_manager.is_complete():
-            if all(msg.is_completed for msg in self.comparison_manager.messages.values()):
+            if self.comparison_manager.all_messages_completed():
                 print(f"All messages completed at frame {self.comparison_manager.current_frame}.")
             else:
                 print(f"Simulation completed after {self.comparison_manager.total_frames} frames.")
@@ -0,0 +1,82 @@
+import contextlib
+import io
+import os
+import random
+import sys
+import unittest
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator.message import Message
+from simulator.node import Node
+from simulator.simulator import Simulator
+
+
+def learn_trees(num_nodes=10, seed=2):
+    """Run a fast learning phase and return every node's knowledge tree"""
+    random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = Simulator()
+        sim.setup_simulation(num_nodes, 5, 60)
+        sim.setup_learning_phase()
+        sim._run_fast_learning()
+    return {node_id: {dest: sorted(entries, key=repr) for dest, entries in node.knowledge_tree.items()}
+            for node_id, node in sim.network.nodes.items()}
+
+
+class FloodFanoutTest(unittest.TestCase):
+    """FLOOD_FANOUT limits comparison-phase flooding only"""
+
+    def tearDown(self):
+        Node.FLOOD_FANOUT = None
+
+    def test_learning_trees_unaffected_by_fanout(self):
+        full_trees = learn_trees()
+        Node.FLOOD_FANOUT = 1
+        self.assertEqual(learn_trees(), full_trees)
+
+    def test_fanout_applies_to_comparison_flooding(self):
+        Node.FLOOD_FANOUT = 1
+        node = Node(0, 0.0, 0.0)
+        for neighbor_id in (1, 2, 3):
+            node.add_neighbor(neighbor_id)
+        message = Message(0, 0, 9, 60)
+        self.assertEqual(len(node.get_routing_decision(message, 4, "flooding", "comparison")), 1)
+        self.assertEqual(len(node.get_routing_decision(message, 4, "flooding", "learning")), 3)
+
+
+class HopDecayForwardingTest(unittest.TestCase):
+    """FORWARD_PROB_BASE thins comparison-phase relays only"""
+
+    def setUp(self):
+        Node.FORWARD_PROB_BASE = 0.01
+
+    def tearDown(self):
+        Node.FORWARD_PROB_BASE = None
+
+    def test_source_always_forwards(self):
+        node = Node(0, 0.0, 0.0)
+        node.add_neighbor(1)
+        for msg_id in range(50):
+            message = Message(msg_id, 0, 9, 60)
+            self.assertEqual(node.get_routing_decision(message, message.hop_limit, "flooding", "comparison"), (1,))
+
+    def test_relays_thinned_in_comparison_only(self):
+        node = Node(0, 0.0, 0.0)
+        node.add_neighbor(1)
+        messages = [Message(msg_id, 5, 9, 60) for msg_id in range(50)]
+        comparison_sent = [node.get_routing_decision(m, m.hop_limit - 1, "flooding", "comparison") for m in messages]
+        learning_sent = [node.get_routing_decision(m, m.hop_limit - 1, "flooding", "learning") for m in messages]
+        self.assertLess(sum(1 for sent in comparison_sent if sent), 50)
+        self.assertTrue(all(sent == (1,) for sent in learning_sent))
+
+    def test_learning_trees_unaffected(self):
+        Node.FORWARD_PROB_BASE = None
+        full_trees = learn_trees()
+        Node.FORWARD_PROB_BASE = 0.5
+        self.assertEqual(learn_trees(), full_trees)
+
+
+if __name__ == "__main__":
+    unittest.main()
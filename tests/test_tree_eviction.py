@@ -0,0 +1,31 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator.node import Node
+
+
+class TreeEvictionTest(unittest.TestCase):
+    """TREE_TTL_FRAMES ages comparison-phase entries only"""
+
+    def test_learning_entries_survive_ttl(self):
+        node = Node(2, 0.0, 0.0)
+        node._learn_path([0, 1, 2], 2, 1, "learning")
+        node._learn_path([5, 2], 1, 1, "comparison")
+        node._evict_stale(1 + Node.TREE_TTL_FRAMES + 1)
+        self.assertEqual(sorted(node.knowledge_tree), [0, 1])
+        self.assertIsNone(node.oldest_learned_frame)
+
+    def test_fresh_comparison_entries_kept(self):
+        node = Node(2, 0.0, 0.0)
+        node._learn_path([5, 2], 1, 1, "comparison")
+        node._learn_path([6, 2], 1, 900, "comparison")
+        node._evict_stale(1 + Node.TREE_TTL_FRAMES + 1)
+        self.assertEqual(sorted(node.knowledge_tree), [6])
+        self.assertEqual(node.oldest_learned_frame, 900)
+
+
+if __name__ == "__main__":
+    unittest.main()